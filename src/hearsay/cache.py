@@ -0,0 +1,72 @@
+"""On-disk cache for deterministic, expensive-to-compute text."""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+
+def get_cache_dir() -> Path:
+    """Get the cache directory from env var or default location."""
+    if cache_dir := os.environ.get("HEARSAY_CACHE_DIR"):
+        return Path(cache_dir)
+    return Path.home() / ".cache" / "hearsay"
+
+
+def cache_enabled() -> bool:
+    """Whether caching is on (set HEARSAY_NO_CACHE=1 to turn it off)."""
+    return os.environ.get("HEARSAY_NO_CACHE", "") in ("", "0")
+
+
+def content_key(*parts: str | bytes) -> str:
+    """Hash the given parts into a short hex cache key.
+
+    Each part is length-prefixed so that different splits of the same bytes
+    never collide.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """Hash a file's contents, reading it in blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_cache(namespace: str, key: str) -> str | None:
+    """Return the cached text for a key, or None on a miss."""
+    if not cache_enabled():
+        return None
+    try:
+        return (get_cache_dir() / namespace / f"{key}.txt").read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+def write_cache(namespace: str, key: str, text: str) -> None:
+    """Store text under a key.
+
+    The file is written to a temporary name and renamed into place, so
+    concurrent readers never see a partial entry. Failures are ignored; the
+    cache is only an optimization.
+    """
+    if not cache_enabled():
+        return
+    cache_dir = get_cache_dir() / namespace
+    path = cache_dir / f"{key}.txt"
+    tmp_path = cache_dir / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
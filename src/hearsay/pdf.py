@@ -1,10 +1,29 @@
 """PDF text extraction using PyMuPDF."""
 
+import os
 import re
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
 import fitz  # PyMuPDF
 
+from hearsay.cache import content_key, file_digest, read_cache, write_cache
+
+
+# Bump when extraction or cleaning logic changes to invalidate cached text
+TEXT_CACHE_VERSION = "2"
+
+# Documents with at least this many pages have their text extracted by a pool
+# of worker processes (PyMuPDF is not thread-safe and holds the GIL)
+PARALLEL_MIN_PAGES = 50
+
+# Images below this many pixels, or stretched beyond this aspect ratio, are
+# icons, logos, rules or banners rather than figures; rejecting them here saves
+# a Claude classification call each
+MIN_FIGURE_PIXELS = 20000
+MAX_FIGURE_ASPECT = 8
 
 # Patterns that indicate a cover/citation page to skip
 SKIP_PAGE_PATTERNS = [
@@ -14,12 +33,22 @@ SKIP_PAGE_PATTERNS = [
     r"This content was downloaded from IP address",
 ]
 
-# Multi-line blocks to remove (applied before line-by-line cleaning)
+# HAL archive header block: removed from "HAL Id:" up to the first of these
+# markers (see _strip_marked_blocks)
+HAL_HEADER_START = r"HAL Id:"
+HAL_HEADER_END = r"From sedimentary|Abstract|Introduction|\n\n[A-Z][a-z]"
+
+# JSTOR header block: removed from "Source:" past the next "Stable URL:" up to
+# the first of these markers (see _strip_marked_blocks)
+JSTOR_HEADER_START = r"Source:"
+JSTOR_HEADER_URL = r"Stable URL:"
+JSTOR_HEADER_END = r"ABSTRACT|Abstract|Introduction"
+
+# Multi-line blocks to remove (applied before line-by-line cleaning, after the
+# HAL and JSTOR headers above). These start at phrases that only appear in the
+# artifacts themselves, so their lazy matches stay cheap.
 REMOVE_BLOCKS = [
-    # HAL archive header block
-    r"HAL Id:.*?(?=From sedimentary|Abstract|Introduction|\n\n[A-Z][a-z])",
     # JSTOR header block
-    r"Source:.*?Stable URL:.*?(?=ABSTRACT|Abstract|Introduction)",
     r"JSTOR is a not-for-profit service.*?(?=ABSTRACT|Abstract|[A-Z]{2,})",
     r"Your use of the JSTOR archive.*?(?=\n\n)",
     r"This content downloaded from.*?(?=\n\n|\n[A-Z])",
@@ -63,56 +92,118 @@ REMOVE_PATTERNS = [
     r"^Keywords:\s*$",
 ]
 
+# Words that mark a section heading when they start a short line
+HEADING_WORDS = frozenset({
+    "abstract", "introduction", "methods", "results",
+    "discussion", "conclusion", "references", "acknowledgment",
+    "keywords", "summary", "background",
+})
+
+
+def _alternation(patterns: list[str], flags: int = 0) -> re.Pattern:
+    """Compile a list of patterns into a single regex matching any of them."""
+    return re.compile("|".join(f"(?:{p})" for p in patterns), flags)
+
+
+# Precompiled forms of the pattern lists above. The skip-page patterns are only
+# searched for, so they are combined into one alternation and the page is
+# scanned once. The removal patterns stay separate and run in order: removing
+# one artifact can expose text that a later pattern should also remove.
+_SKIP_PAGE_RE = _alternation(SKIP_PAGE_PATTERNS, re.IGNORECASE)
+_HAL_START_RE = re.compile(HAL_HEADER_START, re.IGNORECASE)
+_HAL_END_RE = re.compile(HAL_HEADER_END, re.IGNORECASE)
+_JSTOR_START_RE = re.compile(JSTOR_HEADER_START, re.IGNORECASE)
+_JSTOR_URL_RE = re.compile(JSTOR_HEADER_URL, re.IGNORECASE)
+_JSTOR_END_RE = re.compile(JSTOR_HEADER_END, re.IGNORECASE)
+_REMOVE_BLOCKS_RE = [
+    re.compile(p, re.MULTILINE | re.DOTALL | re.IGNORECASE) for p in REMOVE_BLOCKS
+]
+_REMOVE_PATTERNS_RE = [re.compile(p, re.MULTILINE) for p in REMOVE_PATTERNS]
 
-def extract_text_raw(pdf_path: Path) -> str:
-    """Extract raw text from PDF with minimal cleaning.
+_LIGATURES = str.maketrans({"ﬁ": "fi", "ﬂ": "fl", "ﬀ": "ff", "ﬃ": "ffi", "ﬄ": "ffl"})
 
-    Only fixes ligatures and normalizes whitespace. Use this when
-    sending to Claude for AI-based cleaning.
+_WHITESPACE_RE = re.compile(r"[ \t]+")
+_EXCESS_NEWLINES_RE = re.compile(r"\n{3,}")
+_PAGE_NUMBER_RE = re.compile(r"^\d+\s*$", re.MULTILINE)
+_CITATION_END_RE = re.compile(r"\d{4}[a-z]?\)\s*\.?\s*$")
+_NUMBERED_HEADING_RE = re.compile(r"^\d+\.?\d*\.?\s+[A-Z]")
+_SLUG_STRIP_RE = re.compile(r"[^\w\s-]")
+_SLUG_SEPARATORS_RE = re.compile(r"[\s_]+")
+
+
+@contextmanager
+def open_pdf(pdf: Path | fitz.Document) -> Iterator[fitz.Document]:
+    """Open a PDF for the extraction functions in this module.
+
+    Pass the yielded document to several of them (e.g. ``extract_text_raw``
+    and ``extract_figures``) so the file is only parsed once. A document that
+    is already open is yielded as-is and left for its owner to close.
+
+    Opening by path lets MuPDF read the file on demand (only the xref table
+    and the objects actually used), so large PDFs are never loaded whole.
 
     Args:
-        pdf_path: Path to the PDF file.
+        pdf: Path to the PDF file, or an open document.
 
-    Returns:
-        Raw extracted text with minimal cleaning.
+    Raises:
+        FileNotFoundError: If the PDF file doesn't exist.
+        RuntimeError: If the PDF cannot be opened.
     """
-    if not pdf_path.exists():
-        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    if isinstance(pdf, fitz.Document):
+        yield pdf
+        return
+
+    if not pdf.exists():
+        raise FileNotFoundError(f"PDF not found: {pdf}")
 
     try:
-        doc = fitz.open(pdf_path)
+        doc = fitz.open(pdf)
     except Exception as e:
         raise RuntimeError(f"Failed to open PDF: {e}")
 
-    text_parts = []
     try:
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            if text.strip():
-                text_parts.append(text)
+        yield doc
     finally:
         doc.close()
 
-    text = "\n".join(text_parts)
+
+def extract_text_raw(pdf_path: Path | fitz.Document) -> str:
+    """Extract raw text from PDF with minimal cleaning.
+
+    Only fixes ligatures and normalizes whitespace. Use this when
+    sending to Claude for AI-based cleaning.
+
+    Args:
+        pdf_path: Path to the PDF file, or a document from ``open_pdf``.
+
+    Returns:
+        Raw extracted text with minimal cleaning.
+    """
+    cache_key = _text_cache_key(pdf_path, "raw")
+    if cache_key and (cached := read_cache("text", cache_key)) is not None:
+        return cached
+
+    with open_pdf(pdf_path) as doc:
+        text = "\n".join(_iter_page_texts(doc))
 
     # Fix ligatures only
-    ligatures = {"ﬁ": "fi", "ﬂ": "fl", "ﬀ": "ff", "ﬃ": "ffi", "ﬄ": "ffl"}
-    for lig, replacement in ligatures.items():
-        text = text.replace(lig, replacement)
+    text = text.translate(_LIGATURES)
 
     # Basic whitespace normalization
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _WHITESPACE_RE.sub(" ", text)
+    text = _EXCESS_NEWLINES_RE.sub("\n\n", text)
 
-    return text.strip()
+    text = text.strip()
+    if cache_key:
+        write_cache("text", cache_key, text)
+    return text
 
 
-def extract_text(pdf_path: Path) -> str:
+def extract_text(pdf_path: Path | fitz.Document) -> str:
     """Extract text content from a PDF file with full cleaning.
 
     Args:
-        pdf_path: Path to the PDF file.
+        pdf_path: Path to the PDF file, or a document from ``open_pdf``.
 
     Returns:
         Extracted text as a single string.
@@ -121,39 +212,81 @@ def extract_text(pdf_path: Path) -> str:
         FileNotFoundError: If the PDF file doesn't exist.
         RuntimeError: If the PDF cannot be opened or read.
     """
-    if not pdf_path.exists():
+    cache_key = _text_cache_key(pdf_path, "clean")
+    if cache_key and (cached := read_cache("text", cache_key)) is not None:
+        return cached
+
+    with open_pdf(pdf_path) as doc:
+        full_text = "\n".join(_iter_page_texts(doc, skip_covers=True))
+
+    text = clean_text(full_text)
+    if cache_key:
+        write_cache("text", cache_key, text)
+    return text
+
+
+def _text_cache_key(pdf_path: Path | fitz.Document, mode: str) -> str | None:
+    """Cache key for text extracted from a PDF, keyed by its contents.
+
+    Returns None for open documents that weren't loaded from a file.
+    """
+    if isinstance(pdf_path, fitz.Document):
+        if not pdf_path.name:
+            return None
+        pdf_path = Path(pdf_path.name)
+    elif not pdf_path.exists():
         raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    return content_key(TEXT_CACHE_VERSION, mode, file_digest(pdf_path))
 
-    try:
-        doc = fitz.open(pdf_path)
-    except Exception as e:
-        raise RuntimeError(f"Failed to open PDF: {e}")
 
-    text_parts = []
-    try:
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
+def _iter_page_texts(doc: fitz.Document, skip_covers: bool = False) -> Iterator[str]:
+    """Yield the text of each non-empty page in the document.
 
-            # Skip cover/citation pages
-            if _is_skip_page(text):
-                continue
+    Args:
+        doc: An open PyMuPDF document.
+        skip_covers: Whether to skip cover/citation pages.
+    """
+    for text in _page_texts(doc):
+        # Skip cover/citation pages
+        if skip_covers and _is_skip_page(text):
+            continue
 
-            if text.strip():
-                text_parts.append(text)
-    finally:
-        doc.close()
+        if text.strip():
+            yield text
+
+
+def _page_texts(doc: fitz.Document) -> Iterator[str]:
+    """Yield the text of every page in order.
+
+    Long documents are split into contiguous page ranges that worker processes
+    extract in parallel, each reopening the file by path.
+    """
+    page_count = len(doc)
+    workers = min(os.cpu_count() or 1, 8)
+
+    if page_count < PARALLEL_MIN_PAGES or workers < 2 or not doc.name or doc.is_encrypted:
+        for page in doc:
+            yield page.get_text()
+        return
+
+    step = -(-page_count // workers)  # ceil division
+    starts = range(0, page_count, step)
+    stops = [min(start + step, page_count) for start in starts]
 
-    full_text = "\n".join(text_parts)
-    return clean_text(full_text)
+    with ProcessPoolExecutor(max_workers=len(starts)) as pool:
+        for texts in pool.map(_extract_page_range, [doc.name] * len(starts), starts, stops):
+            yield from texts
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> list[str]:
+    """Extract the text of pages [start, stop) from a PDF (worker process)."""
+    with fitz.open(pdf_path) as doc:
+        return [page.get_text() for page in doc.pages(start, stop)]
 
 
 def _is_skip_page(text: str) -> bool:
     """Check if a page is a cover/citation page that should be skipped."""
-    for pattern in SKIP_PAGE_PATTERNS:
-        if re.search(pattern, text, re.IGNORECASE):
-            return True
-    return False
+    return _SKIP_PAGE_RE.search(text) is not None
 
 
 def clean_text(text: str) -> str:
@@ -168,74 +301,96 @@ def clean_text(text: str) -> str:
         Cleaned text.
     """
     # Fix common ligature issues
-    ligatures = {
-        "ﬁ": "fi",
-        "ﬂ": "fl",
-        "ﬀ": "ff",
-        "ﬃ": "ffi",
-        "ﬄ": "ffl",
-    }
-    for lig, replacement in ligatures.items():
-        text = text.replace(lig, replacement)
+    text = text.translate(_LIGATURES)
 
     # Remove multi-line block patterns first
-    for pattern in REMOVE_BLOCKS:
-        text = re.sub(pattern, "", text, flags=re.MULTILINE | re.DOTALL | re.IGNORECASE)
+    text = _strip_marked_blocks(text, _HAL_START_RE, _HAL_END_RE)
+    text = _strip_marked_blocks(text, _JSTOR_START_RE, _JSTOR_END_RE, via=(_JSTOR_URL_RE,))
+    for pattern in _REMOVE_BLOCKS_RE:
+        text = pattern.sub("", text)
 
     # Remove known line patterns
-    for pattern in REMOVE_PATTERNS:
-        text = re.sub(pattern, "", text, flags=re.MULTILINE)
+    for pattern in _REMOVE_PATTERNS_RE:
+        text = pattern.sub("", text)
 
     # Remove standalone page numbers
-    text = re.sub(r"^\d+\s*$", "", text, flags=re.MULTILINE)
+    text = _PAGE_NUMBER_RE.sub("", text)
 
     # Collapse multiple spaces
-    text = re.sub(r"[ \t]+", " ", text)
+    text = _WHITESPACE_RE.sub(" ", text)
 
     # Normalize newlines BEFORE rejoining (so we have clean single/double breaks)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _EXCESS_NEWLINES_RE.sub("\n\n", text)
 
-    # Rejoin lines broken mid-sentence by PDF column layout
+    # Rejoin lines broken mid-sentence by PDF column layout. This also strips
+    # each line and collapses runs of blank lines left behind by the removals.
     text = _rejoin_broken_lines(text)
 
-    # Clean up any remaining excessive newlines
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    # Remove empty lines at start/end
+    return text.strip()
 
-    # Strip leading/trailing whitespace from each line
-    lines = [line.strip() for line in text.split("\n")]
-    text = "\n".join(lines)
 
-    # Remove empty lines at start/end
-    text = text.strip()
+def _strip_marked_blocks(
+    text: str, start_re: re.Pattern, end_re: re.Pattern, via: tuple[re.Pattern, ...] = ()
+) -> str:
+    """Remove blocks running from a start marker up to the first end marker.
 
-    return text
+    Equivalent to a lazy DOTALL match ``start.*?via.*?(?=end)``, where the
+    optional ``via`` markers must appear in order in between, but done as
+    forward searches. As a regex, every start marker with nothing after it to
+    complete the block rescans the rest of the document; here the first such
+    marker ends the search, since no later one can be completed either.
+    """
+    parts = []
+    pos = 0
+    while (start := start_re.search(text, pos)) is not None:
+        cursor = start.end()
+        for marker_re in (*via, end_re):
+            marker = marker_re.search(text, cursor)
+            if marker is None:
+                break
+            cursor = marker.end()
+        if marker is None:
+            break
+        parts.append(text[pos:start.start()])
+        pos = marker.start()  # the end marker itself is kept
+
+    if not parts:
+        return text
+    parts.append(text[pos:])
+    return "".join(parts)
 
 
 def _rejoin_broken_lines(text: str) -> str:
     """Rejoin lines that were broken mid-sentence by PDF layout.
 
     Uses heuristics to determine when lines should be joined vs kept separate.
+    Output lines are stripped, and consecutive blank lines are collapsed into one.
     """
-    lines = text.split("\n")
+    # Strip every line once up front; the look-ahead below revisits lines
+    lines = [line.strip() for line in text.split("\n")]
+    n = len(lines)
     result = []
+    ends_sentence = _ends_sentence
+    is_heading = _is_heading
     i = 0
 
-    while i < len(lines):
-        line = lines[i].strip()
+    while i < n:
+        line = lines[i]
 
         # Look ahead and join continuation lines
-        while i + 1 < len(lines):
-            next_line = lines[i + 1].strip()
+        while i + 1 < n:
+            next_line = lines[i + 1]
 
             # Handle empty lines (possible page breaks mid-sentence)
             if not next_line:
                 # Look ahead past the empty line
-                if i + 2 < len(lines):
-                    after_empty = lines[i + 2].strip()
+                if i + 2 < n:
+                    after_empty = lines[i + 2]
                     # If current line doesn't end sentence and line after empty
                     # starts with lowercase, bridge the gap (page break mid-sentence)
                     if (after_empty and after_empty[0].islower() and
-                        not _ends_sentence(line) and not _is_heading(after_empty)):
+                        not ends_sentence(line) and not is_heading(after_empty)):
                         i += 1  # Skip empty line
                         next_line = after_empty
                     else:
@@ -244,11 +399,11 @@ def _rejoin_broken_lines(text: str) -> str:
                     break
 
             # Don't join if current line is a heading
-            if _is_heading(line):
+            if is_heading(line):
                 break
 
             # Don't join if next line is a heading
-            if _is_heading(next_line):
+            if is_heading(next_line):
                 break
 
             # Join if current line ends with hyphen (word break)
@@ -257,17 +412,16 @@ def _rejoin_broken_lines(text: str) -> str:
                 i += 1
                 continue
 
-            # Check if this line looks like it ends mid-sentence
-            ends_complete = _ends_sentence(line)
-
             # If line doesn't end a sentence, join with next
-            if not ends_complete:
-                line = line + " " + next_line
+            if not ends_sentence(line):
+                line += " " + next_line
                 i += 1
             else:
                 break
 
-        result.append(line)
+        # Lines are already stripped; keep at most one blank line in a row
+        if line or (result and result[-1]):
+            result.append(line)
         i += 1
 
     return "\n".join(result)
@@ -278,57 +432,23 @@ def _ends_sentence(line: str) -> bool:
     if not line:
         return True
 
+    # Cheap character tests first; trailing whitespace is ignored here
+    stripped = line.rstrip()
+
     # Ends with terminal punctuation
-    if re.search(r"[.!?]\s*$", line):
+    if stripped.endswith((".", "!", "?")):
         return True
 
     # Ends with closing parenthesis after citation (common pattern)
-    if re.search(r"\d{4}[a-z]?\)\s*\.?\s*$", line):
+    if stripped.endswith(")") and _CITATION_END_RE.search(stripped):
         return True
 
     # Ends with colon (often introduces a list or section)
     if line.endswith(":"):
         return True
 
-    # These patterns indicate sentence continues on next line
-    continuation_endings = [
-        r",$",           # Comma
-        r";$",           # Semicolon
-        r"\band$",       # "and"
-        r"\bor$",        # "or"
-        r"\bthe$",       # "the"
-        r"\ba$",         # "a"
-        r"\ban$",        # "an"
-        r"\bof$",        # "of"
-        r"\bin$",        # "in"
-        r"\bto$",        # "to"
-        r"\bfor$",       # "for"
-        r"\bwith$",      # "with"
-        r"\bby$",        # "by"
-        r"\bfrom$",      # "from"
-        r"\bthat$",      # "that"
-        r"\bwhich$",     # "which"
-        r"\bas$",        # "as"
-        r"\bat$",        # "at"
-        r"\bon$",        # "on"
-        r"\bis$",        # "is"
-        r"\bare$",       # "are"
-        r"\bwas$",       # "was"
-        r"\bwere$",      # "were"
-        r"\bet$",        # "et" (et al)
-        r"\bal$",        # "al" (et al)
-        r"\(.*$",        # Open parenthesis not closed
-    ]
-
-    for pattern in continuation_endings:
-        if re.search(pattern, line, re.IGNORECASE):
-            return False
-
-    # If line is short and doesn't end with punctuation, likely continues
-    if len(line) < 60 and not re.search(r"[.!?:;,]$", line):
-        return False
-
-    # Default: assume it doesn't end (safer for prose)
+    # Anything else (trailing commas and conjunctions, unclosed parentheses,
+    # short unpunctuated lines) is assumed to continue on the next line
     return False
 
 
@@ -338,7 +458,7 @@ def _is_heading(line: str) -> bool:
         return False
 
     # Numbered sections like "1. Introduction" or "2.1 Methods"
-    if re.match(r"^\d+\.?\d*\.?\s+[A-Z]", line):
+    if line[0].isdigit() and _NUMBERED_HEADING_RE.match(line):
         return True
 
     # All caps short lines
@@ -346,55 +466,58 @@ def _is_heading(line: str) -> bool:
         return True
 
     # Common heading words at start
-    heading_words = ["abstract", "introduction", "methods", "results",
-                     "discussion", "conclusion", "references", "acknowledgment",
-                     "keywords", "summary", "background"]
-    first_word = line.split()[0].lower().rstrip(".:") if line.split() else ""
-    if first_word in heading_words and len(line) < 40:
+    words = line.split(None, 1)
+    first_word = words[0].lower().rstrip(".:") if words else ""
+    if first_word in HEADING_WORDS and len(line) < 40:
         return True
 
     # Very short lines that start with caps are likely headings
     if len(line) < 30 and line[0].isupper() and not line.endswith(","):
-        words = line.split()
-        if len(words) <= 4:
+        # Only need to know whether there are more than four words
+        if len(line.split(None, 4)) <= 4:
             return True
 
     return False
 
 
-def extract_figures(pdf_path: Path, output_dir: Path, min_size: int = 10000) -> list[Path]:
+def extract_figures(
+    pdf_path: Path | fitz.Document, output_dir: Path, min_size: int = 10000
+) -> list[Path]:
     """Extract figures/images from a PDF file.
 
+    Obvious non-figures are skipped locally: images that are too small or too
+    stretched (see MIN_FIGURE_PIXELS and MAX_FIGURE_ASPECT), and images that
+    repeat, either as the same object (a logo placed on every page) or with
+    identical bytes.
+
     Args:
-        pdf_path: Path to the PDF file.
+        pdf_path: Path to the PDF file, or a document from ``open_pdf``.
         output_dir: Directory to save extracted images.
         min_size: Minimum image size in bytes to include (filters out icons/logos).
 
     Returns:
         List of paths to extracted image files.
     """
-    if not pdf_path.exists():
-        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    with open_pdf(pdf_path) as doc:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
 
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    try:
-        doc = fitz.open(pdf_path)
-    except Exception as e:
-        raise RuntimeError(f"Failed to open PDF: {e}")
+        extracted = []
+        figure_num = 1
+        seen_xrefs = set()
+        seen_digests = set()
 
-    extracted = []
-    figure_num = 1
-
-    try:
-        for page_num in range(len(doc)):
-            page = doc[page_num]
+        for page in doc:
             image_list = page.get_images(full=True)
 
             for img_index, img_info in enumerate(image_list):
                 xref = img_info[0]
 
+                # Skip images already seen on an earlier page
+                if xref in seen_xrefs:
+                    continue
+                seen_xrefs.add(xref)
+
                 try:
                     base_image = doc.extract_image(xref)
                     image_bytes = base_image["image"]
@@ -403,6 +526,18 @@ def extract_figures(pdf_path: Path, output_dir: Path, min_size: int = 10000) ->
                     if len(image_bytes) < min_size:
                         continue
 
+                    # Skip tiny or strip-shaped images (icons, rules, banners)
+                    width, height = base_image["width"], base_image["height"]
+                    if (width * height < MIN_FIGURE_PIXELS
+                            or max(width, height) > MAX_FIGURE_ASPECT * min(width, height)):
+                        continue
+
+                    # Skip byte-identical copies stored as separate objects
+                    digest = content_key(image_bytes)
+                    if digest in seen_digests:
+                        continue
+                    seen_digests.add(digest)
+
                     # Determine file extension
                     ext = base_image.get("ext", "png")
                     if ext == "jpeg":
@@ -420,9 +555,6 @@ def extract_figures(pdf_path: Path, output_dir: Path, min_size: int = 10000) ->
                     # Skip images that can't be extracted
                     continue
 
-    finally:
-        doc.close()
-
     return extracted
 
 
@@ -443,25 +575,24 @@ def get_text_stats(text: str) -> dict:
     }
 
 
-def slugify(title: str, max_length: int = 80) -> str:
+def slugify(title: str, max_length: int = 80, lowercase: bool = True) -> str:
     """Convert a title to a safe filename slug.
 
     Args:
         title: The paper title.
         max_length: Maximum length of the slug.
+        lowercase: Whether to lowercase the slug.
 
     Returns:
         A filesystem-safe slug.
     """
     # Remove special characters, keep alphanumeric and spaces
-    slug = re.sub(r"[^\w\s-]", "", title)
-    # Replace spaces with underscores
-    slug = re.sub(r"[\s]+", "_", slug)
-    # Remove consecutive underscores
-    slug = re.sub(r"_+", "_", slug)
+    slug = _SLUG_STRIP_RE.sub("", title)
+    # Replace runs of spaces and underscores with a single underscore
+    slug = _SLUG_SEPARATORS_RE.sub("_", slug)
     # Truncate and strip
     slug = slug[:max_length].strip("_")
-    return slug.lower()
+    return slug.lower() if lowercase else slug
 
 
 def save_text(text: str, title: str, output_dir: Path) -> Path:
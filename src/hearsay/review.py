@@ -1,18 +1,60 @@
 """Anthropic API integration for paper processing."""
 
 import base64
+import functools
+import mmap
 import os
 import re
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
 import anthropic
 from dotenv import load_dotenv
 
+from hearsay.cache import content_key, file_digest, read_cache, write_cache
 
+load_dotenv()
+
+# Claude models used for each review step
+FILTER_MODEL = "claude-haiku-4-5-20251001"
+DESCRIBE_MODEL = "claude-sonnet-4-20250514"
+CLEAN_MODEL = "claude-haiku-4-5-20251001"
+
+# Most Anthropic requests allowed in flight at once, across all worker pools
+MAX_CONCURRENT_REQUESTS = 8
+
+# Limits for one multi-image classification request (images, raw file bytes)
+CLASSIFY_BATCH_SIZE = 10
+CLASSIFY_BATCH_BYTES = 16 * 1024 * 1024
+
+# Part of every classification cache key; bump it when either classification
+# prompt (single-image or batched) changes so stale verdicts aren't reused
+CLASSIFY_PROMPT_VERSION = "1"
+
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+# Characters dropped from slugs, and whitespace runs turned into underscores
+_SLUG_STRIP_RE = re.compile(r"[^\w\s-]")
+_SLUG_SPACES_RE = re.compile(r"\s+")
+
+# Most base64 data kept in memory for reuse (characters, ~1 byte each)
+ENCODED_IMAGE_CACHE_BYTES = 64 * 1024 * 1024
+
+# Keyed by (device, inode, mtime, size), so entries survive renames.
+# Cleared at the end of each process_paper call.
+_encoded_images: OrderedDict[tuple, str] = OrderedDict()
+_encoded_images_bytes = 0
+_encoded_images_lock = threading.Lock()
+
+
+@functools.cache
 def get_client() -> anthropic.Anthropic:
-    """Get an Anthropic client using the API key from environment or .env file."""
-    load_dotenv()
+    """Get an Anthropic client using the API key from environment or .env file.
 
+    The client is created once and shared, so every request reuses the same
+    HTTP connection pool instead of opening new TLS connections.
+    """
     api_key = os.environ.get("ANTHROPIC_API_KEY")
     if not api_key:
         raise ValueError(
@@ -23,17 +65,67 @@ def get_client() -> anthropic.Anthropic:
     return anthropic.Anthropic(api_key=api_key)
 
 
+def _create_message(client: anthropic.Anthropic, **kwargs) -> anthropic.types.Message:
+    """Send a Messages API request, waiting for a free request slot first.
+
+    Figure filtering, figure descriptions and text cleaning all run in thread
+    pools at the same time; the shared limit keeps them from bursting past the
+    account's rate limit.
+    """
+    with _request_slots:
+        return client.messages.create(**kwargs)
+
+
+def _stream_message(client: anthropic.Anthropic, **kwargs) -> anthropic.types.Message:
+    """Stream a Messages API response and return the final message.
+
+    Like _create_message, this waits for a free request slot. Streaming keeps
+    the connection busy while tokens arrive, so long generations don't run
+    into the SDK's timeout for non-streaming requests.
+    """
+    with _request_slots, client.messages.stream(**kwargs) as stream:
+        return stream.get_final_message()
+
+
 def slugify(title: str, max_length: int = 80) -> str:
     """Convert a title to a safe filename/folder slug."""
-    slug = re.sub(r"[^\w\s-]", "", title)
-    slug = re.sub(r"[\s]+", "_", slug)
-    slug = slug[:max_length].strip("_")
-    return slug.lower()
+    slug = _SLUG_SPACES_RE.sub("_", _SLUG_STRIP_RE.sub("", title))
+    return slug[:max_length].strip("_").lower()
 
 
 def _encode_image(image_path: Path) -> tuple[str, str]:
-    """Encode an image to base64 and determine its media type."""
-    image_data = base64.standard_b64encode(image_path.read_bytes()).decode("utf-8")
+    """Encode an image to base64 and determine its media type.
+
+    The file is memory-mapped rather than read into a bytes copy, and the
+    result is memoized on the file's identity, so an image that is classified
+    and then described (after being renamed) is only encoded once. The memo
+    holds at most ENCODED_IMAGE_CACHE_BYTES, least recently used out first.
+    """
+    global _encoded_images_bytes
+
+    with open(image_path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        with _encoded_images_lock:
+            image_data = _encoded_images.get(key)
+            if image_data is not None:
+                _encoded_images.move_to_end(key)
+
+        if image_data is None:
+            if stat.st_size == 0:
+                image_data = ""  # mmap can't map an empty file
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    image_data = base64.standard_b64encode(mm).decode("ascii")
+
+            with _encoded_images_lock:
+                if key not in _encoded_images and len(image_data) <= ENCODED_IMAGE_CACHE_BYTES:
+                    _encoded_images[key] = image_data
+                    _encoded_images_bytes += len(image_data)
+                    while _encoded_images_bytes > ENCODED_IMAGE_CACHE_BYTES:
+                        _, evicted = _encoded_images.popitem(last=False)
+                        _encoded_images_bytes -= len(evicted)
 
     suffix = image_path.suffix.lower()
     media_type_map = {
@@ -48,6 +140,14 @@ def _encode_image(image_path: Path) -> tuple[str, str]:
     return image_data, media_type
 
 
+def _clear_encoded_images() -> None:
+    """Drop all memoized image encodings."""
+    global _encoded_images_bytes
+    with _encoded_images_lock:
+        _encoded_images.clear()
+        _encoded_images_bytes = 0
+
+
 def is_paper_figure(image_path: Path, paper_context: str = "") -> bool:
     """Check if an image is an actual paper figure vs an ad/artifact.
 
@@ -58,6 +158,10 @@ def is_paper_figure(image_path: Path, paper_context: str = "") -> bool:
     Returns:
         True if this appears to be a real figure, False if it's an ad/artifact.
     """
+    cache_key = _classify_cache_key(image_path, paper_context)
+    if (cached := read_cache("classify", cache_key)) is not None:
+        return cached == "figure"
+
     client = get_client()
     image_data, media_type = _encode_image(image_path)
 
@@ -67,8 +171,9 @@ Reply with ONLY one word: "figure" or "artifact"
 
 {f"Paper topic: {paper_context}" if paper_context else ""}"""
 
-    message = client.messages.create(
-        model="claude-haiku-4-5-20251001",
+    message = _create_message(
+        client,
+        model=FILTER_MODEL,
         max_tokens=10,
         messages=[
             {
@@ -89,7 +194,161 @@ Reply with ONLY one word: "figure" or "artifact"
     )
 
     response = message.content[0].text.strip().lower()
-    return "figure" in response
+    is_figure = "figure" in response
+    write_cache("classify", cache_key, "figure" if is_figure else "artifact")
+    return is_figure
+
+
+def _classify_cache_key(image_path: Path, paper_context: str) -> str:
+    """Cache key for an image's figure/artifact verdict.
+
+    Batched and single-image classification share it, so a verdict from
+    either is reused by both. It hashes the file itself, so checking the
+    cache never needs the base64 encoding. CLASSIFY_PROMPT_VERSION stands in
+    for the prompts, which differ between the two paths.
+    """
+    return content_key(FILTER_MODEL, CLASSIFY_PROMPT_VERSION, paper_context,
+                       file_digest(image_path))
+
+
+def classify_figures(image_paths: list[Path], paper_context: str = "") -> list[bool]:
+    """Check which images are actual paper figures, several per request.
+
+    Images with a cached verdict are skipped. The rest are sent in batches of
+    up to CLASSIFY_BATCH_SIZE, with the batches running in parallel. If a
+    batch request fails or its reply can't be parsed, its images are checked
+    one at a time with is_paper_figure; an image that still can't be
+    classified is kept.
+
+    Args:
+        image_paths: Paths to the images.
+        paper_context: Context about the paper topic.
+
+    Returns:
+        One verdict per image, in order: True for a real figure, False for an
+        ad/artifact.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    verdicts = {}
+    uncached = []
+    for path in image_paths:
+        cached = read_cache("classify", _classify_cache_key(path, paper_context))
+        if cached is None:
+            uncached.append(path)
+        else:
+            verdicts[path] = cached == "figure"
+
+    batches = _batch_images(uncached)
+    if batches:
+        with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            results = executor.map(lambda b: _classify_batch_or_each(b, paper_context), batches)
+            for batch, batch_verdicts in zip(batches, results):
+                verdicts.update(zip(batch, batch_verdicts))
+
+    return [verdicts[path] for path in image_paths]
+
+
+def _classify_batch_or_each(image_paths: list[Path], paper_context: str) -> list[bool]:
+    """Classify a batch in one request, falling back to one request per image.
+
+    Failures are contained here, so one bad batch or image never discards
+    the verdicts for the others.
+    """
+    try:
+        verdicts = _classify_batch(image_paths, paper_context)
+    except Exception as e:
+        print(f"    Warning: Could not classify {len(image_paths)} images together: {e}")
+        verdicts = None
+    if verdicts is not None:
+        return verdicts
+
+    verdicts = []
+    for image_path in image_paths:
+        try:
+            verdicts.append(is_paper_figure(image_path, paper_context))
+        except Exception as e:
+            print(f"    Warning: Could not classify {image_path.name}: {e}")
+            verdicts.append(True)
+    return verdicts
+
+
+def _batch_images(image_paths: list[Path]) -> list[list[Path]]:
+    """Group images into batches within the classification request limits."""
+    batches = []
+    current = []
+    current_bytes = 0
+
+    for path in image_paths:
+        size = path.stat().st_size
+        if current and (len(current) == CLASSIFY_BATCH_SIZE
+                        or current_bytes + size > CLASSIFY_BATCH_BYTES):
+            batches.append(current)
+            current = []
+            current_bytes = 0
+        current.append(path)
+        current_bytes += size
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _classify_batch(image_paths: list[Path], paper_context: str) -> list[bool] | None:
+    """Classify a batch of images in one request.
+
+    Returns:
+        One verdict per image, or None if the reply doesn't have exactly one
+        "figure"/"artifact" line per image.
+    """
+    client = get_client()
+
+    content = []
+    for i, image_path in enumerate(image_paths, 1):
+        image_data, media_type = _encode_image(image_path)
+        content.append({"type": "text", "text": f"Image {i}:"})
+        content.append({
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": media_type,
+                "data": image_data,
+            },
+        })
+
+    count = len(image_paths)
+    prompt = f"""For each of the {count} images above, is it a scientific figure from an academic paper, or is it an advertisement, journal logo, conference announcement, or other non-figure artifact?
+
+Reply with one line per image, in order, each containing ONLY one word: "figure" or "artifact"
+
+{f"Paper topic: {paper_context}" if paper_context else ""}"""
+    content.append({"type": "text", "text": prompt})
+
+    message = _create_message(
+        client,
+        model=FILTER_MODEL,
+        max_tokens=10 * count,
+        messages=[{"role": "user", "content": content}],
+    )
+
+    # Tolerate "Image 1: figure" style lines by reading only the last word
+    verdicts = []
+    for line in message.content[0].text.lower().splitlines():
+        words = line.split()
+        if not words:
+            continue
+        word = words[-1].strip(".:*\"'")
+        if word not in ("figure", "artifact"):
+            return None
+        verdicts.append(word == "figure")
+
+    if len(verdicts) != count:
+        return None
+
+    for image_path, is_figure in zip(image_paths, verdicts):
+        cache_key = _classify_cache_key(image_path, paper_context)
+        write_cache("classify", cache_key, "figure" if is_figure else "artifact")
+    return verdicts
 
 
 def describe_figure(image_path: Path, figure_num: int, paper_context: str = "") -> str:
@@ -103,7 +362,6 @@ def describe_figure(image_path: Path, figure_num: int, paper_context: str = "")
     Returns:
         A description of the figure suitable for a podcast.
     """
-    client = get_client()
     image_data, media_type = _encode_image(image_path)
 
     prompt = f"""Describe this figure (Figure {figure_num}) from an academic paper in 2-4 sentences.
@@ -115,8 +373,14 @@ Focus on:
 Keep the description clear and suitable for a podcast listener who cannot see the image.
 {f"Paper context: {paper_context}" if paper_context else ""}"""
 
-    message = client.messages.create(
-        model="claude-sonnet-4-20250514",
+    cache_key = content_key(DESCRIBE_MODEL, prompt, image_data)
+    if (cached := read_cache("describe", cache_key)) is not None:
+        return cached
+
+    client = get_client()
+    message = _create_message(
+        client,
+        model=DESCRIBE_MODEL,
         max_tokens=500,
         messages=[
             {
@@ -136,7 +400,11 @@ Keep the description clear and suitable for a podcast listener who cannot see th
         ],
     )
 
-    return message.content[0].text
+    description = message.content[0].text
+    # A truncated or refused description isn't cached, so the next run retries it
+    if message.stop_reason == "end_turn":
+        write_cache("describe", cache_key, description)
+    return description
 
 
 def _chunk_text(text: str, max_chars: int = 12000) -> list[str]:
@@ -179,12 +447,21 @@ Instructions:
 Raw PDF text:
 {chunk}"""
 
-    message = client.messages.create(
-        model="claude-haiku-4-5-20251001",
+    cache_key = content_key(CLEAN_MODEL, prompt)
+    if (cached := read_cache("clean", cache_key)) is not None:
+        return cached
+
+    message = _stream_message(
+        client,
+        model=CLEAN_MODEL,
         max_tokens=8000,
         messages=[{"role": "user", "content": prompt}]
     )
-    return message.content[0].text
+    cleaned = message.content[0].text
+    # A truncated or refused chunk isn't cached, so the next run retries it
+    if message.stop_reason == "end_turn":
+        write_cache("clean", cache_key, cleaned)
+    return cleaned
 
 
 def clean_paper_text(raw_text: str, title: str | None = None) -> str:
@@ -242,7 +519,7 @@ def process_paper(
     Returns:
         Dictionary with paths and metadata.
     """
-    from hearsay.pdf import extract_text_raw, extract_figures as pdf_extract_figures
+    from hearsay.pdf import extract_text_raw, extract_figures as pdf_extract_figures, open_pdf
 
     # Create paper folder
     paper_slug = slugify(title)
@@ -261,76 +538,84 @@ def process_paper(
 
     from concurrent.futures import ThreadPoolExecutor, as_completed
 
-    # Extract raw text and figures (both fast, local)
-    print(f"  Extracting text...")
-    raw_text = extract_text_raw(pdf_path)
-
+    # Extract raw text and figures (both fast, local) from one parse of the PDF
     figure_paths = []
     all_images = []
-    if extract_figures:
-        print(f"  Extracting figures...")
-        all_images = pdf_extract_figures(pdf_path, img_dir)
-        print(f"  Found {len(all_images)} images")
+    with open_pdf(pdf_path) as doc:
+        print(f"  Extracting text...")
+        raw_text = extract_text_raw(doc)
+
+        if extract_figures:
+            print(f"  Extracting figures...")
+            all_images = pdf_extract_figures(doc, img_dir)
+            print(f"  Found {len(all_images)} images")
 
     # Run text cleaning and figure processing in parallel
     # Text cleaning is the bottleneck — start it ASAP alongside figure API calls
     print(f"  Running text cleaning + figure processing in parallel...")
 
-    with ThreadPoolExecutor(max_workers=8) as pool:
-        # Submit text cleaning (internally parallelized into chunks)
-        text_future = pool.submit(clean_paper_text, raw_text, title)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            # Submit text cleaning (internally parallelized into chunks)
+            text_future = pool.submit(clean_paper_text, raw_text, title)
 
-        # Submit all figure filter calls in parallel
-        if all_images:
-            filter_futures = {
-                pool.submit(is_paper_figure, img, title): img
-                for img in all_images
-            }
-
-            for future in as_completed(filter_futures):
-                img_path = filter_futures[future]
+            # Classify all images in as few requests as possible
+            if all_images:
                 try:
-                    if future.result():
+                    verdicts = classify_figures(all_images, title)
+                except Exception as e:
+                    print(f"    Warning: Could not classify figures: {e}")
+                    verdicts = [True] * len(all_images)
+
+                rejected = []
+                for img_path, is_figure in zip(all_images, verdicts):
+                    if is_figure:
                         figure_paths.append(img_path)
                     else:
                         print(f"    Filtered out artifact: {img_path.name}")
-                        img_path.unlink()
-                except Exception as e:
-                    print(f"    Warning: Could not classify {img_path.name}: {e}")
-                    figure_paths.append(img_path)
-
-            # Sort by original order and rename sequentially
-            figure_paths.sort(key=lambda p: all_images.index(p))
-            final_paths = []
-            for i, fig_path in enumerate(figure_paths, 1):
-                new_name = f"figure_{i}{fig_path.suffix}"
-                new_path = fig_path.parent / new_name
-                if fig_path != new_path:
-                    fig_path.rename(new_path)
-                final_paths.append(new_path)
-            figure_paths = final_paths
-            result["figures"] = figure_paths
-            print(f"  Kept {len(figure_paths)} figures")
-
-        # Submit figure descriptions in parallel (after filtering)
-        if describe_figures and figure_paths:
-            print(f"  Describing {len(figure_paths)} figures in parallel...")
-            desc_futures = {
-                pool.submit(describe_figure, fig_path, i, title): (i, fig_path)
-                for i, fig_path in enumerate(figure_paths, 1)
-            }
-            for future in as_completed(desc_futures):
-                i, fig_path = desc_futures[future]
-                try:
-                    result["figure_descriptions"][f"figure_{i}"] = future.result()
-                    print(f"    Figure {i} described")
-                except Exception as e:
-                    print(f"    Warning: Could not describe figure {i}: {e}")
-                    result["figure_descriptions"][f"figure_{i}"] = f"[Figure {i}]"
-
-        # Wait for text cleaning to finish
-        clean_text = text_future.result()
-        print(f"  Text cleaning done ({len(clean_text):,} chars)")
+                        rejected.append(img_path)
+
+                # Delete artifacts before renaming, so no rename lands on a file
+                # that is about to be removed
+                for img_path in rejected:
+                    img_path.unlink()
+
+                # Renumber sequentially in original order. Figures only move to
+                # lower numbers, so renaming in ascending order never overwrites
+                # a figure that hasn't moved yet.
+                final_paths = [
+                    fig_path.with_name(f"figure_{i}{fig_path.suffix}")
+                    for i, fig_path in enumerate(figure_paths, 1)
+                ]
+                for old_path, new_path in zip(figure_paths, final_paths):
+                    if old_path != new_path:
+                        os.replace(old_path, new_path)
+                figure_paths = final_paths
+                result["figures"] = figure_paths
+                print(f"  Kept {len(figure_paths)} figures")
+
+            # Submit figure descriptions in parallel (after filtering)
+            if describe_figures and figure_paths:
+                print(f"  Describing {len(figure_paths)} figures in parallel...")
+                desc_futures = {
+                    pool.submit(describe_figure, fig_path, i, title): (i, fig_path)
+                    for i, fig_path in enumerate(figure_paths, 1)
+                }
+                for future in as_completed(desc_futures):
+                    i, fig_path = desc_futures[future]
+                    try:
+                        result["figure_descriptions"][f"figure_{i}"] = future.result()
+                        print(f"    Figure {i} described")
+                    except Exception as e:
+                        print(f"    Warning: Could not describe figure {i}: {e}")
+                        result["figure_descriptions"][f"figure_{i}"] = f"[Figure {i}]"
+
+            # Wait for text cleaning to finish
+            clean_text = text_future.result()
+            print(f"  Text cleaning done ({len(clean_text):,} chars)")
+    finally:
+        # This paper's images won't be sent again, even if processing failed
+        _clear_encoded_images()
 
     # Insert figure descriptions into the markdown
     if result["figure_descriptions"]:
@@ -355,27 +640,24 @@ def _insert_figure_descriptions(
     the AI-generated description and image path after them.
     """
     # Add a figures section at the end if not present
-    figures_section = "\n\n## Figures\n\n"
+    parts = ["\n\n## Figures\n\n"]
 
     for i, (key, desc) in enumerate(descriptions.items(), 1):
         fig_num = i
+        parts.append(f"### Figure {fig_num}\n\n")
         if figure_paths and i <= len(figure_paths):
             img_path = figure_paths[i - 1]
             rel_path = f"img/{img_path.name}"
-            figures_section += f"### Figure {fig_num}\n\n"
-            figures_section += f"![Figure {fig_num}]({rel_path})\n\n"
-            figures_section += f"**Description:** {desc}\n\n"
-        else:
-            figures_section += f"### Figure {fig_num}\n\n"
-            figures_section += f"**Description:** {desc}\n\n"
+            parts.append(f"![Figure {fig_num}]({rel_path})\n\n")
+        parts.append(f"**Description:** {desc}\n\n")
 
-    # Insert before References section if it exists, otherwise at end
-    if "## References" in markdown:
-        markdown = markdown.replace("## References", figures_section + "## References")
-    else:
-        markdown += figures_section
+    figures_section = "".join(parts)
 
-    return markdown
+    # Insert before the References section if it exists, otherwise at end
+    idx = markdown.find("## References")
+    if idx == -1:
+        return markdown + figures_section
+    return markdown[:idx] + figures_section + markdown[idx:]
 
 
 # Test when run directly
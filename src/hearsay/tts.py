@@ -1,51 +1,58 @@
 """Text-to-speech using Kokoro TTS (local, free)."""
 
-import os
-import re
+import contextlib
+import subprocess
 import tempfile
+from collections.abc import Iterable, Iterator
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
 import numpy as np
-import soundfile as sf
-from pydub import AudioSegment
+
+from hearsay.cache import content_key, read_cache, write_cache
+from hearsay.pdf import slugify
 
 # Kokoro sample rate
 SAMPLE_RATE = 24000
 
+# Claude model used to write the narration script
+SCRIPT_MODEL = "claude-opus-4-20250514"
+
 # Default narrator voice
 DEFAULT_VOICE = "af_heart"
 
+# Brief pause between paragraphs (0.4s)
+PAUSE_SAMPLES = int(SAMPLE_RATE * 0.4)
+
 # Lazy-loaded pipeline singleton
 _pipeline = None
 
 
-def _get_pipeline():
+def _get_pipeline(voice: str = DEFAULT_VOICE):
     """Get or create the Kokoro TTS pipeline (lazy singleton).
 
     First call downloads the model (~300MB) from HuggingFace and takes a few seconds.
     Subsequent calls return the cached pipeline instantly.
+
+    The voice pack is loaded here as well. KPipeline keeps loaded voices, so
+    synthesis calls reuse it instead of fetching it when the first paragraph
+    arrives.
     """
     global _pipeline
     if _pipeline is None:
         from kokoro import KPipeline
         print("  Loading Kokoro TTS model...")
         _pipeline = KPipeline(lang_code='a')  # American English
+    _pipeline.load_voice(voice)
     return _pipeline
 
 
 def _get_client():
-    """Get an Anthropic client."""
-    import anthropic
-    from dotenv import load_dotenv
-
-    load_dotenv()
+    """Get the shared Anthropic client."""
+    from hearsay.review import get_client
 
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY not set")
-    return anthropic.Anthropic(api_key=api_key)
+    return get_client()
 
 
 def _build_script_prompt(paper_markdown: str, title: str) -> str:
@@ -110,19 +117,29 @@ def generate_script(paper_markdown: str, title: str) -> str:
         title: Paper title.
 
     Returns:
-        Plain narration text (no dialogue labels).
+        Plain narration text (no dialogue labels). Cached by paper, prompt
+        and model, so regenerating for an unchanged paper is free.
     """
-    client = _get_client()
     prompt = _build_script_prompt(paper_markdown, title)
+    cache_key = content_key(SCRIPT_MODEL, prompt)
+    if (cached := read_cache("script", cache_key)) is not None:
+        print("  Using cached script")
+        return cached
+
+    client = _get_client()
 
     print("  Calling Claude API for script generation...")
     message = client.messages.create(
-        model="claude-opus-4-20250514",
+        model=SCRIPT_MODEL,
         max_tokens=8000,
         messages=[{"role": "user", "content": prompt}]
     )
 
-    return message.content[0].text
+    script = message.content[0].text
+    # A script cut off at max_tokens isn't cached, so the next run retries it
+    if message.stop_reason == "end_turn":
+        write_cache("script", cache_key, script)
+    return script
 
 
 def set_mp3_metadata(
@@ -158,19 +175,100 @@ def set_mp3_metadata(
     tags.save(mp3_path)
 
 
+def _to_pcm16(audio) -> np.ndarray:
+    """Quantize float audio in [-1, 1] to 16-bit PCM."""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+
 def _synthesize_segment(pipeline, text: str, voice: str) -> np.ndarray:
-    """Synthesize a single text segment and return concatenated audio.
+    """Synthesize a single text segment and return it as 16-bit PCM.
 
-    Kokoro's pipeline yields chunks; we concatenate them into one array.
+    Kokoro's pipeline yields float chunks; we concatenate them into one array
+    and quantize right away, since the MP3 encoder takes 16-bit samples anyway.
     """
     chunks = []
     for _graphemes, _phonemes, audio in pipeline(text, voice=voice, speed=1.2):
         chunks.append(audio)
 
     if not chunks:
-        return np.array([], dtype=np.float32)
+        return np.array([], dtype=np.int16)
+
+    return _to_pcm16(np.concatenate(chunks))
+
+
+def _duration_minutes(segments: list[np.ndarray]) -> float:
+    """Length of the segments once joined with pauses, in minutes."""
+    total = sum(seg.size for seg in segments) + PAUSE_SAMPLES * (len(segments) - 1)
+    return total / SAMPLE_RATE / 60
 
-    return np.concatenate(chunks)
+
+def _export_mp3(segments: list[np.ndarray], output_path: Path) -> None:
+    """Encode 16-bit PCM segments as a 192 kbps MP3, with a brief pause between each.
+
+    The samples are piped straight into ffmpeg segment by segment, so the
+    full recording is never joined into one buffer in memory.
+
+    Raises:
+        RuntimeError: If ffmpeg is missing or fails to encode.
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+        "-f", "mp3", "-b:a", "192k", str(output_path),
+    ]
+    # stderr goes to a file rather than a pipe: nothing reads it until all
+    # audio is written, and a full pipe would block ffmpeg and us with it
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=stderr_file)
+        except FileNotFoundError:
+            raise RuntimeError("ffmpeg not found; it is required for MP3 encoding")
+
+        pause = bytes(PAUSE_SAMPLES * 2)  # 16-bit silence
+
+        # If ffmpeg exits early, writing fails; its error is reported below
+        with contextlib.suppress(BrokenPipeError), proc.stdin:
+            for i, seg in enumerate(segments):
+                if i:
+                    proc.stdin.write(pause)
+                # Little-endian, as declared by "-f s16le" (no copy on LE hosts)
+                proc.stdin.write(seg.astype("<i2", copy=False).data)
+
+        if proc.wait() != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg failed to encode {output_path}: {stderr}")
+
+
+def _iter_paragraphs(text_stream: Iterable[str]) -> Iterator[str]:
+    """Yield stripped, non-empty paragraphs from text arriving in pieces.
+
+    Pieces of the unfinished paragraph are collected in a list and only
+    joined once a break arrives. Each new piece is searched on its own (plus
+    one carried-over character, for a break split across pieces), rather
+    than rescanning everything buffered so far.
+    """
+    pending = []
+    last_char = ""
+    for chunk in text_stream:
+        if not chunk:
+            continue
+        if "\n\n" not in last_char + chunk:
+            pending.append(chunk)
+            last_char = chunk[-1]
+            continue
+
+        *paragraphs, rest = ("".join(pending) + chunk).split("\n\n")
+        for paragraph in paragraphs:
+            paragraph = paragraph.strip()
+            if paragraph:
+                yield paragraph
+        pending = [rest]
+        last_char = rest[-1:]
+
+    paragraph = "".join(pending).strip()
+    if paragraph:
+        yield paragraph
 
 
 def generate_audio(
@@ -181,8 +279,9 @@ def generate_audio(
 ) -> Path:
     """Generate audio from a narration script using Kokoro TTS.
 
-    Splits the script into paragraphs, synthesizes each, and combines
-    them into a single MP3 with brief pauses between paragraphs.
+    Splits the script into paragraphs, synthesizes them in a single
+    pipeline pass, and combines them into a single MP3 with brief pauses
+    between paragraphs.
 
     Args:
         script: Plain narration text.
@@ -193,51 +292,42 @@ def generate_audio(
     Returns:
         Path to the saved audio file.
     """
-    pipeline = _get_pipeline()
+    pipeline = _get_pipeline(voice)
 
     # Split into paragraphs for progress reporting and natural pauses
-    paragraphs = [p.strip() for p in script.split('\n\n') if p.strip()]
+    paragraphs = list(_iter_paragraphs([script]))
     if not paragraphs:
         paragraphs = [script.strip()]
 
     print(f"  Synthesizing {len(paragraphs)} paragraphs...")
 
-    # Brief pause between paragraphs (0.4s)
-    pause = np.zeros(int(SAMPLE_RATE * 0.4), dtype=np.float32)
-
-    audio_segments = []
-    for i, para in enumerate(paragraphs):
-        preview = para[:60] + "..." if len(para) > 60 else para
-        print(f"    [{i+1}/{len(paragraphs)}] {preview}")
-
-        segment = _synthesize_segment(pipeline, para, voice)
-        if segment.size > 0:
-            audio_segments.append(segment)
-            audio_segments.append(pause)
+    # One pipeline call for all paragraphs; each result's text_index says
+    # which paragraph its audio chunk belongs to
+    chunks_per_para = [[] for _ in paragraphs]
+    current = -1
+    for result in pipeline(paragraphs, voice=voice, speed=1.2):
+        if result.text_index != current:
+            current = result.text_index
+            para = paragraphs[current]
+            preview = para[:60] + "..." if len(para) > 60 else para
+            print(f"    [{current+1}/{len(paragraphs)}] {preview}")
+        chunks_per_para[current].append(result.audio)
+
+    audio_segments = [
+        _to_pcm16(np.concatenate(chunks)) for chunks in chunks_per_para if chunks
+    ]
 
     if not audio_segments:
         raise ValueError("No audio was generated")
 
-    # Combine
-    print("  Combining audio...")
-    combined = np.concatenate(audio_segments)
-
-    duration_min = len(combined) / SAMPLE_RATE / 60
+    duration_min = _duration_minutes(audio_segments)
     print(f"  Total duration: {duration_min:.1f} minutes")
 
-    # WAV -> MP3
+    # Encode
+    print("  Encoding MP3...")
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        tmp_wav = Path(tmp.name)
-
-    try:
-        sf.write(str(tmp_wav), combined, SAMPLE_RATE)
-        audio_seg = AudioSegment.from_wav(str(tmp_wav))
-        audio_seg.export(str(output_path), format="mp3", bitrate="192k")
-    finally:
-        tmp_wav.unlink(missing_ok=True)
+    _export_mp3(audio_segments, output_path)
 
     # Metadata
     print("  Setting MP3 metadata...")
@@ -262,6 +352,8 @@ def create_podcast(
 
     Streams the Claude response paragraph-by-paragraph and feeds completed
     paragraphs to a TTS worker thread, so generation and synthesis overlap.
+    A script already generated for the same paper, prompt and model is read
+    from the cache instead.
 
     Args:
         paper_markdown: Cleaned paper markdown.
@@ -276,18 +368,16 @@ def create_podcast(
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Pre-load TTS model so it's ready when first paragraph arrives
-    pipeline = _get_pipeline()
+    pipeline = _get_pipeline(voice)
 
-    client = _get_client()
     prompt = _build_script_prompt(paper_markdown, title)
-
-    print("\nStreaming script + synthesizing audio...")
+    cache_key = content_key(SCRIPT_MODEL, prompt)
+    cached_script = read_cache("script", cache_key)
 
     # Single TTS worker: synthesizes paragraphs in order while Claude streams
     executor = ThreadPoolExecutor(max_workers=1)
     tts_futures = []
     script_parts = []
-    buffer = ""
     para_idx = 0
 
     def _submit_paragraph(text: str):
@@ -299,39 +389,42 @@ def create_podcast(
         future = executor.submit(_synthesize_segment, pipeline, text, voice)
         tts_futures.append(future)
 
-    with client.messages.stream(
-        model="claude-opus-4-20250514",
-        max_tokens=8000,
-        messages=[{"role": "user", "content": prompt}],
-    ) as stream:
-        for chunk in stream.text_stream:
-            buffer += chunk
+    if cached_script is not None:
+        # Same paper, prompt and model as a previous run: skip the API call
+        print("\nUsing cached script + synthesizing audio...")
+        for paragraph in _iter_paragraphs([cached_script]):
+            _submit_paragraph(paragraph)
+    else:
+        print("\nStreaming script + synthesizing audio...")
+        client = _get_client()
+
+        with client.messages.stream(
+            model=SCRIPT_MODEL,
+            max_tokens=8000,
+            messages=[{"role": "user", "content": prompt}],
+        ) as stream:
             # Emit complete paragraphs as they arrive
-            while "\n\n" in buffer:
-                paragraph, buffer = buffer.split("\n\n", 1)
-                paragraph = paragraph.strip()
-                if paragraph:
-                    _submit_paragraph(paragraph)
+            for paragraph in _iter_paragraphs(stream.text_stream):
+                _submit_paragraph(paragraph)
 
-    # Flush remaining buffer
-    if buffer.strip():
-        _submit_paragraph(buffer.strip())
+            # A script cut off at max_tokens isn't cached, so the next run retries it
+            complete = stream.get_final_message().stop_reason == "end_turn"
 
     print(f"  Script complete: {para_idx} paragraphs")
 
     # Save script
     script = "\n\n".join(script_parts)
+    if cached_script is None and complete:
+        write_cache("script", cache_key, script)
     script_path = output_dir / "script.txt"
     script_path.write_text(script)
 
     # Collect audio segments in order (blocks until each future completes)
-    pause = np.zeros(int(SAMPLE_RATE * 0.4), dtype=np.float32)
     audio_segments = []
     for i, future in enumerate(tts_futures):
         segment = future.result()
         if segment.size > 0:
             audio_segments.append(segment)
-            audio_segments.append(pause)
         print(f"  [audio {i + 1}/{len(tts_futures)}] done")
 
     executor.shutdown(wait=False)
@@ -339,26 +432,14 @@ def create_podcast(
     if not audio_segments:
         raise ValueError("No audio was generated")
 
-    # Combine and export
-    print("  Combining audio...")
-    combined = np.concatenate(audio_segments)
-    duration_min = len(combined) / SAMPLE_RATE / 60
+    duration_min = _duration_minutes(audio_segments)
     print(f"  Total duration: {duration_min:.1f} minutes")
 
-    safe_title = re.sub(r'[^\w\s-]', '', title)
-    safe_title = re.sub(r'\s+', '_', safe_title)[:60]
-    audio_path = output_dir / f"{safe_title}.mp3"
+    # Encode
+    print("  Encoding MP3...")
+    audio_path = output_dir / f"{slugify(title, max_length=60, lowercase=False)}.mp3"
     audio_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-        tmp_wav = Path(tmp.name)
-
-    try:
-        sf.write(str(tmp_wav), combined, SAMPLE_RATE)
-        audio_seg = AudioSegment.from_wav(str(tmp_wav))
-        audio_seg.export(str(audio_path), format="mp3", bitrate="192k")
-    finally:
-        tmp_wav.unlink(missing_ok=True)
+    _export_mp3(audio_segments, audio_path)
 
     # Metadata
     set_mp3_metadata(
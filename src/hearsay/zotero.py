@@ -1,10 +1,94 @@
 """Zotero SQLite database integration."""
 
+import atexit
+import functools
 import os
 import sqlite3
+import threading
 from dataclasses import dataclass
 from pathlib import Path
 
+from hearsay.cache import cache_enabled, get_cache_dir
+
+# Read-only tuning applied to every connection
+CONNECTION_PRAGMAS = (
+    "PRAGMA query_only = 1",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000",  # negative = KiB, so ~20 MB
+    "PRAGMA mmap_size = 268435456",
+)
+
+# Joins each item to its PDF attachments, if any
+# The 'key' column is in the items table, not itemAttachments
+# contentType = 'application/pdf' for PDF files
+_PDF_ATTACHMENT_JOIN = """
+    LEFT JOIN itemAttachments ia
+      ON ia.parentItemID = i.itemID AND ia.contentType = 'application/pdf'
+    LEFT JOIN items att ON ia.itemID = att.itemID
+"""
+
+_COLLECTIONS_SQL = "SELECT collectionName, collectionID FROM collections ORDER BY collectionID"
+
+# Items in a collection with their titles and PDF attachments
+# itemTypeID 2 = 'attachment', we want parent items
+# fieldID 1 = 'title' field
+_COLLECTION_PAPERS_SQL = f"""
+    SELECT i.itemID, idv.value as title, ia.path, att.key
+    FROM collectionItems ci
+    JOIN items i ON ci.itemID = i.itemID
+    LEFT JOIN itemData id ON i.itemID = id.itemID AND id.fieldID = 1
+    LEFT JOIN itemDataValues idv ON id.valueID = idv.valueID
+    {_PDF_ATTACHMENT_JOIN}
+    WHERE ci.collectionID = ?
+      AND i.itemTypeID != 2
+    ORDER BY title, i.itemID, ia.itemID
+"""
+
+# Sidecar full-text index of titles, since the Zotero database is read-only
+# Trigram tokens make MATCH a case-insensitive substring search, like LIKE
+TITLE_INDEX_NAME = "titles_fts.sqlite"
+
+# Trigram MATCH needs at least this many characters
+TITLE_INDEX_MIN_QUERY = 3
+
+_TITLE_INDEX_SCHEMA = """
+    CREATE VIRTUAL TABLE titles USING fts5(itemID UNINDEXED, title, tokenize='trigram')
+"""
+
+_TITLE_INDEX_FILL_SQL = """
+    INSERT INTO titles (itemID, title)
+    SELECT id.itemID, idv.value
+    FROM z.itemData id
+    JOIN z.itemDataValues idv ON id.valueID = idv.valueID
+    WHERE id.fieldID = 1
+"""
+
+# Same as _SEARCH_PAPERS_SQL, but narrowing titles through the sidecar index
+# MATCH finds candidates, LIKE keeps the exact semantics of the plain search
+# Unqualified Zotero tables resolve to the attached database
+_SEARCH_INDEX_SQL = f"""
+    SELECT i.itemID, t.title, ia.path, att.key
+    FROM titles t
+    JOIN items i ON t.itemID = i.itemID
+    {_PDF_ATTACHMENT_JOIN}
+    WHERE t.title MATCH ?
+      AND t.title LIKE ?
+      AND i.itemTypeID != 2
+    ORDER BY t.title, i.itemID, ia.itemID
+"""
+
+# All items whose title matches, with their PDF attachments
+_SEARCH_PAPERS_SQL = f"""
+    SELECT i.itemID, idv.value as title, ia.path, att.key
+    FROM items i
+    LEFT JOIN itemData id ON i.itemID = id.itemID AND id.fieldID = 1
+    LEFT JOIN itemDataValues idv ON id.valueID = idv.valueID
+    {_PDF_ATTACHMENT_JOIN}
+    WHERE i.itemTypeID != 2
+      AND idv.value LIKE ?
+    ORDER BY title, i.itemID, ia.itemID
+"""
+
 
 @dataclass
 class Paper:
@@ -35,6 +119,44 @@ def get_storage_dir(zotero_dir: Path | None = None) -> Path:
     return zotero_dir / "storage"
 
 
+# Open connections keyed by database path, with the mtime they were opened at
+_connections: dict[Path, tuple[int, sqlite3.Connection]] = {}
+_connections_lock = threading.Lock()
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    """Get a shared read-only connection to the Zotero database.
+
+    Uses immutable mode to avoid locking conflicts when Zotero is running.
+    The connection is reused across calls; since immutable mode never notices
+    Zotero's writes, it is reopened whenever the database's mtime changes.
+    """
+    mtime = db_path.stat().st_mtime_ns
+    with _connections_lock:
+        cached = _connections.get(db_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        if cached:
+            cached[1].close()
+
+        conn = sqlite3.connect(
+            f"file:{db_path}?immutable=1", uri=True, check_same_thread=False
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        _connections[db_path] = (mtime, conn)
+        return conn
+
+
+@atexit.register
+def _close_connections() -> None:
+    """Close all shared connections at interpreter exit."""
+    with _connections_lock:
+        for _, conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
 def get_collections(zotero_dir: Path | None = None) -> list[str]:
     """Get all collection names from the Zotero library.
 
@@ -49,13 +171,8 @@ def get_collections(zotero_dir: Path | None = None) -> list[str]:
     if not db_path.exists():
         raise FileNotFoundError(f"Zotero database not found at {db_path}")
 
-    # Use immutable mode to avoid locking conflicts when Zotero is running
-    conn = sqlite3.connect(f"file:{db_path}?immutable=1", uri=True)
-    try:
-        cursor = conn.execute("SELECT collectionName FROM collections ORDER BY collectionName")
-        return [row[0] for row in cursor.fetchall()]
-    finally:
-        conn.close()
+    names, _ = _collection_index(db_path)
+    return list(names)
 
 
 def get_papers_in_collection(collection_name: str, zotero_dir: Path | None = None) -> list[Paper]:
@@ -74,80 +191,68 @@ def get_papers_in_collection(collection_name: str, zotero_dir: Path | None = Non
     if not db_path.exists():
         raise FileNotFoundError(f"Zotero database not found at {db_path}")
 
-    # Use immutable mode to avoid locking conflicts when Zotero is running
-    conn = sqlite3.connect(f"file:{db_path}?immutable=1", uri=True)
-    try:
-        # Get collection ID
-        cursor = conn.execute(
-            "SELECT collectionID FROM collections WHERE collectionName = ?",
-            (collection_name,)
-        )
-        row = cursor.fetchone()
-        if not row:
-            raise ValueError(f"Collection '{collection_name}' not found")
-        collection_id = row[0]
-
-        # Get items in collection with their titles
-        # itemTypeID 2 = 'attachment', we want parent items
-        # fieldID 1 = 'title' field
-        query = """
-            SELECT DISTINCT i.itemID, idv.value as title
-            FROM collectionItems ci
-            JOIN items i ON ci.itemID = i.itemID
-            LEFT JOIN itemData id ON i.itemID = id.itemID AND id.fieldID = 1
-            LEFT JOIN itemDataValues idv ON id.valueID = idv.valueID
-            WHERE ci.collectionID = ?
-              AND i.itemTypeID != 2
-            ORDER BY title
-        """
-        cursor = conn.execute(query, (collection_id,))
-        items = cursor.fetchall()
-
-        papers = []
-        for item_id, title in items:
-            # Find PDF attachment for this item
-            pdf_path = _find_pdf_for_item(conn, item_id, storage_dir)
-            papers.append(Paper(
-                item_id=item_id,
-                title=title or "(No title)",
-                pdf_path=pdf_path
-            ))
-
-        return papers
-    finally:
-        conn.close()
+    # Get collection ID
+    _, collection_ids = _collection_index(db_path)
+    collection_id = collection_ids.get(collection_name)
+    if collection_id is None:
+        raise ValueError(f"Collection '{collection_name}' not found")
+
+    cursor = _connect(db_path).execute(_COLLECTION_PAPERS_SQL, (collection_id,))
+    return _papers_from_rows(cursor.fetchall(), storage_dir)
 
 
-def _find_pdf_for_item(conn: sqlite3.Connection, item_id: int, storage_dir: Path) -> Path | None:
-    """Find the PDF attachment path for an item.
+def _collection_index(db_path: Path) -> tuple[list[str], dict[str, int]]:
+    """Get the sorted collection names and a name -> collectionID map.
+
+    Both are read once and cached until the database's mtime changes.
+    """
+    return _load_collection_index(db_path, db_path.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_collection_index(db_path: Path, mtime_ns: int) -> tuple[list[str], dict[str, int]]:
+    """Read the collections table (cached per database path and mtime)."""
+    rows = _connect(db_path).execute(_COLLECTIONS_SQL).fetchall()
+
+    # Names aren't unique; like a lookup by name, the lowest collectionID wins
+    collection_ids = {}
+    for name, collection_id in rows:
+        collection_ids.setdefault(name, collection_id)
+
+    return sorted(name for name, _ in rows), collection_ids
+
+
+def _papers_from_rows(rows: list[tuple], storage_dir: Path) -> list[Paper]:
+    """Build Paper objects from (itemID, title, attachment path, attachment key) rows.
+
+    Rows come from a query joined with _PDF_ATTACHMENT_JOIN, so an item with
+    several PDF attachments appears once per attachment; the first one wins.
+    """
+    papers = []
+    seen = set()
+    for item_id, title, path, key in rows:
+        if item_id in seen:
+            continue
+        seen.add(item_id)
+        papers.append(Paper(
+            item_id=item_id,
+            title=title or "(No title)",
+            pdf_path=_resolve_pdf_path(path, key, storage_dir)
+        ))
+    return papers
+
+
+def _resolve_pdf_path(path: str | None, key: str | None, storage_dir: Path) -> Path | None:
+    """Find the PDF file for an attachment.
 
     Args:
-        conn: SQLite connection.
-        item_id: The parent item ID.
+        path: The attachment's path column (None if the item has no PDF).
+        key: The attachment item's key.
         storage_dir: Path to Zotero storage directory.
 
     Returns:
         Path to PDF file, or None if not found.
     """
-    # Get attachments for this item
-    # The 'key' column is in the items table, not itemAttachments
-    # contentType = 'application/pdf' for PDF files
-    query = """
-        SELECT ia.path, i.key
-        FROM itemAttachments ia
-        JOIN items i ON ia.itemID = i.itemID
-        WHERE ia.parentItemID = ?
-          AND ia.contentType = 'application/pdf'
-        LIMIT 1
-    """
-    cursor = conn.execute(query, (item_id,))
-    row = cursor.fetchone()
-
-    if not row:
-        return None
-
-    path, key = row
-
     # Zotero stores PDFs in storage/<key>/<filename>
     # The path column has format "storage:filename.pdf"
     if key and path and path.startswith("storage:"):
@@ -156,13 +261,17 @@ def _find_pdf_for_item(conn: sqlite3.Connection, item_id: int, storage_dir: Path
         if pdf_path.exists():
             return pdf_path
 
-    # Fallback: check the directory for any PDF
+    # Fallback: check the directory for any PDF, stopping at the first one
+    # Dotfiles are skipped (e.g. macOS "._paper.pdf" resource forks)
     if key:
-        attachment_dir = storage_dir / key
-        if attachment_dir.exists():
-            pdfs = list(attachment_dir.glob("*.pdf"))
-            if pdfs:
-                return pdfs[0]
+        try:
+            with os.scandir(storage_dir / key) as entries:
+                for entry in entries:
+                    if (entry.name.endswith(".pdf") and not entry.name.startswith(".")
+                            and entry.is_file()):
+                        return Path(entry.path)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
 
     # Fallback: linked files (path without storage: prefix)
     if path and not path.startswith("storage:"):
@@ -189,32 +298,65 @@ def search_papers(query: str, zotero_dir: Path | None = None) -> list[Paper]:
     if not db_path.exists():
         raise FileNotFoundError(f"Zotero database not found at {db_path}")
 
-    conn = sqlite3.connect(f"file:{db_path}?immutable=1", uri=True)
+    # LIKE wildcards in the query have no MATCH equivalent, so scan for those
+    use_index = (
+        cache_enabled()
+        and len(query) >= TITLE_INDEX_MIN_QUERY
+        and "%" not in query
+        and "_" not in query
+    )
+    if use_index:
+        try:
+            return _papers_from_rows(_search_title_index(db_path, query), storage_dir)
+        except (sqlite3.OperationalError, OSError):
+            pass  # Index unavailable (no FTS5, unwritable cache); scan instead
+        except sqlite3.DatabaseError:
+            # Corrupt or not a database: remove it so the next search rebuilds it
+            try:
+                (get_cache_dir() / TITLE_INDEX_NAME).unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    cursor = _connect(db_path).execute(_SEARCH_PAPERS_SQL, (f"%{query}%",))
+    return _papers_from_rows(cursor.fetchall(), storage_dir)
+
+
+def _search_title_index(db_path: Path, query: str) -> list[tuple]:
+    """Run a title search through the sidecar FTS5 index.
+
+    The index lives in the cache directory and is rebuilt whenever the Zotero
+    database's path, size or mtime changes.
+
+    Args:
+        db_path: Path to the Zotero SQLite database.
+        query: Search string to match against titles.
+
+    Returns:
+        Rows in the shape expected by _papers_from_rows.
+    """
+    stat = db_path.stat()
+    stamp = f"{db_path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    index_path = get_cache_dir() / TITLE_INDEX_NAME
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(f"file:{index_path}", uri=True)
     try:
-        # Search all items by title
-        # fieldID 1 = 'title' field
-        sql = """
-            SELECT DISTINCT i.itemID, idv.value as title
-            FROM items i
-            LEFT JOIN itemData id ON i.itemID = id.itemID AND id.fieldID = 1
-            LEFT JOIN itemDataValues idv ON id.valueID = idv.valueID
-            WHERE i.itemTypeID != 2
-              AND idv.value LIKE ?
-            ORDER BY title
-        """
-        cursor = conn.execute(sql, (f"%{query}%",))
-        items = cursor.fetchall()
-
-        papers = []
-        for item_id, title in items:
-            pdf_path = _find_pdf_for_item(conn, item_id, storage_dir)
-            papers.append(Paper(
-                item_id=item_id,
-                title=title or "(No title)",
-                pdf_path=pdf_path
-            ))
-
-        return papers
+        conn.execute("ATTACH DATABASE ? AS z", (f"file:{db_path}?immutable=1",))
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (stamp TEXT)")
+
+        row = conn.execute("SELECT stamp FROM meta").fetchone()
+        if not row or row[0] != stamp:
+            # DELETE opens the transaction first, so the rebuild is atomic
+            with conn:
+                conn.execute("DELETE FROM meta")
+                conn.execute("DROP TABLE IF EXISTS titles")
+                conn.execute(_TITLE_INDEX_SCHEMA)
+                conn.execute(_TITLE_INDEX_FILL_SQL)
+                conn.execute("INSERT INTO meta (stamp) VALUES (?)", (stamp,))
+
+        phrase = '"' + query.replace('"', '""') + '"'
+        return conn.execute(_SEARCH_INDEX_SQL, (phrase, f"%{query}%")).fetchall()
     finally:
         conn.close()
 